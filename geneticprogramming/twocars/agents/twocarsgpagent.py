@@ -1,23 +1,91 @@
-from typing import Any
+from typing import Any, Callable
 from warnings import warn
 
+from geneticprogramming.twocars.gpnodes.twocarsgpcompiler import compile_source, tree_source
 from geneticprogramming.twocars.gpnodes.twocarsgpnode import TwoCarsGPNode, FLOAT
 from geneticprogramming.twocars.twocarsgame import TwoCarsState
 from modularcoevolution.agents.basegptreeagent import BaseGPTreeAgent
+from modularcoevolution.genotypes.geneticprogramming.gptree import GPTree
 
 
 class TwoCarsGPAgent(BaseGPTreeAgent):
+    _policy: Callable[[TwoCarsState], Any] | None
+    """The genotype compiled by `compile_source`, once `_compiled` is true.
+    A value of None means the genotype could not be compiled."""
+    _compiled: bool
+    """Whether `_policy` has been compiled."""
+    _source: str | None
+    """The source of the genotype from `tree_source`, or None if not yet computed.
+    Shared by `structure_key` and `get_policy`, so that the tree is only folded once."""
+    _compiled_genotype: GPTree | None
+    """The genotype that `_policy` and `_source` were computed from, in case the genotype is replaced."""
+    _context: dict[str, Any]
+    """The context passed to the genotype when it is executed without compiling, reused between calls."""
+
     @classmethod
     def genotype_default_parameters(cls, agent_parameters: dict[str, Any] = None) -> dict[str, Any]:
         return {'node_type': TwoCarsGPNode, 'return_type': FLOAT}
 
     def __init__(self, parameters=None, genotype=None, **kwargs):
         super().__init__(parameters=parameters, genotype=genotype, **kwargs)
+        self._policy = None
+        self._compiled = False
+        self._source = None
+        self._compiled_genotype = None
+        self._context = {'state': None}
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Compiled functions can't be pickled, so they are recompiled when needed.
+        state = dict(super().__getstate__())
+        state['_policy'] = None
+        state['_compiled'] = False
+        state['_source'] = None
+        state['_compiled_genotype'] = None
+        state['_context'] = {'state': None}
+        return state
+
+    def _check_genotype(self) -> None:
+        if self._compiled_genotype is not self.genotype:
+            self._policy = None
+            self._compiled = False
+            self._source = None
+            self._compiled_genotype = self.genotype
+
+    def get_policy(self) -> Callable[[TwoCarsState], Any] | None:
+        """Returns the genotype compiled into a function of the game state, compiling it on first use.
+        Returns None if the genotype can't be compiled."""
+        self._check_genotype()
+        if not self._compiled:
+            try:
+                self._policy = compile_source(self._get_source())
+            except ValueError as error:
+                warn(f"Falling back to executing the genotype directly:\n{error}")
+                self._policy = None
+            self._compiled = True
+        return self._policy
+
+    def structure_key(self) -> str | None:
+        """Returns a string which is equal for agents with equivalent genotypes, or None if the genotype can't be compiled.
+        Used as the key for `EvaluationCache`."""
+        self._check_genotype()
+        try:
+            return self._get_source()
+        except ValueError:
+            return None
+
+    def _get_source(self) -> str:
+        if self._source is None:
+            self._source = tree_source(self.genotype)
+        return self._source
 
     def perform_action(self, state: TwoCarsState) -> float:
-        context = {'state': state}
+        policy = self.get_policy()
         try:
-            action = self.genotype.execute(context)
+            if policy is not None:
+                action = policy(state)
+            else:
+                self._context['state'] = state
+                action = self.genotype.execute(self._context)
         except ArithmeticError as error:
             warn(f"Arithmetic error executing genotype:\n{error}")
             action = 0.0
@@ -0,0 +1,100 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Sequence
+
+from modularcoevolution.agents.baseagent import BaseAgent
+from modularcoevolution.experiments.baseexperiment import EvaluateProtocol
+
+
+class EvaluationCache:
+    """Wraps a deterministic evaluation function, reusing the results when the same matchup is evaluated again.
+    In coevolution, surviving individuals are often paired with opponents they've already played.
+
+    Matchups are identified by a key for each agent, so agents built from identical genotypes share results.
+    Exhibition evaluations are never cached.
+
+    If too few recent lookups were hits to be worth the overhead, the cache disables itself.
+
+    The cache is only effective for evaluations run in the process that owns it.
+    Copies made by pickling, such as those sent to the worker processes of a parallel driver, start disabled and empty,
+    since each copy would only see a single evaluation before being discarded."""
+    evaluate: EvaluateProtocol
+    """The wrapped evaluation function."""
+    agent_key: Callable[[BaseAgent], Hashable | None]
+    """Returns a key identifying the behavior of an agent, or None if the agent can't be cached."""
+    max_size: int
+    """Maximum number of matchups to store. The least recently used results are discarded first."""
+    min_hit_rate: float
+    """If the fraction of lookups which were hits over the last `check_interval` lookups is below this, the cache is disabled."""
+    check_interval: int
+    """Number of lookups between checks of `min_hit_rate`."""
+
+    enabled: bool
+    hits: int
+    misses: int
+    _interval_hits: int
+    _interval_lookups: int
+    _results: OrderedDict[tuple[Hashable, ...], Sequence[dict[str, Any]]]
+
+    def __init__(
+            self,
+            evaluate: EvaluateProtocol,
+            agent_key: Callable[[BaseAgent], Hashable | None],
+            max_size: int = 100000,
+            min_hit_rate: float = 0.05,
+            check_interval: int = 10000
+    ):
+        self.evaluate = evaluate
+        self.agent_key = agent_key
+        self.max_size = max_size
+        self.min_hit_rate = min_hit_rate
+        self.check_interval = check_interval
+
+        self.enabled = max_size > 0
+        self.hits = 0
+        self.misses = 0
+        self._interval_hits = 0
+        self._interval_lookups = 0
+        self._results = OrderedDict()
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = self.__dict__.copy()
+        state['enabled'] = False
+        state['_results'] = OrderedDict()
+        return state
+
+    def __call__(self, agents: Sequence[BaseAgent], exhibition: bool = False, **kwargs) -> Sequence[dict[str, Any]]:
+        if exhibition or not self.enabled:
+            return self.evaluate(agents, exhibition=exhibition, **kwargs)
+
+        key = tuple(self.agent_key(agent) for agent in agents)
+        if None in key:
+            return self.evaluate(agents, **kwargs)
+
+        self._interval_lookups += 1
+        if key in self._results:
+            self.hits += 1
+            self._interval_hits += 1
+            self._results.move_to_end(key)
+            results = self._results[key]
+        else:
+            self.misses += 1
+            results = self.evaluate(agents, **kwargs)
+            self._results[key] = results
+            if len(self._results) > self.max_size:
+                self._results.popitem(last=False)
+
+        self._check_hit_rate()
+        return [dict(result) for result in results]
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def _check_hit_rate(self) -> None:
+        if self._interval_lookups < self.check_interval:
+            return
+        if self._interval_hits / self._interval_lookups < self.min_hit_rate:
+            self.enabled = False
+            self._results.clear()
+        self._interval_hits = 0
+        self._interval_lookups = 0
@@ -0,0 +1,257 @@
+import collections
+import functools
+import itertools
+import math
+import re
+from typing import Any, Callable, Hashable, Iterator, NamedTuple
+
+from modularcoevolution.genotypes.geneticprogramming.gpnode import GPNode
+from modularcoevolution.genotypes.geneticprogramming.gptree import GPTree
+
+from geneticprogramming.twocars.twocarsgame import TwoCarsState
+
+
+EXPRESSIONS: dict[str, str] = {
+    'zero': '0.0',
+    'one': '1.0',
+    'pursuer_speed': 's.pursuer.speed',
+    'evader_speed': 's.evader.speed',
+    'pursuer_turning_radius': 's.pursuer.turning_radius',
+    'evader_turning_radius': 's.evader.turning_radius',
+    'distance_pursuer_evader': 'math.sqrt((s.pursuer.x - s.evader.x) ** 2 + (s.pursuer.y - s.evader.y) ** 2)',
+    'distance_pursuer_evader_x': '((s.evader.y - s.pursuer.y) * s.pursuer.cos_heading'
+                                 ' - (s.evader.x - s.pursuer.x) * s.pursuer.sin_heading)',
+    'distance_pursuer_evader_y': '((s.evader.x - s.pursuer.x) * s.pursuer.sin_heading'
+                                 ' - (s.evader.y - s.pursuer.y) * s.pursuer.cos_heading)',
+    'distance_evader_pursuer_x': '((s.pursuer.y - s.evader.y) * s.evader.cos_heading'
+                                 ' - (s.pursuer.x - s.evader.x) * s.evader.sin_heading)',
+    'distance_evader_pursuer_y': '((s.pursuer.x - s.evader.x) * s.evader.sin_heading'
+                                 ' - (s.pursuer.y - s.evader.y) * s.evader.cos_heading)',
+    'time_remaining': 's.turns_remaining',
+    'time_ratio_remaining': '(s.turns_remaining / s.total_turns)',
+    'negate': '(-{0})',
+    'invert': '(math.inf if ({t} := {0}) == 0 else 1 / {t})',
+    'sign': '(1 if ({t} := {0}) > 0 else -1 if {t} < 0 else 0)',
+    'absolute_value': 'abs({0})',
+    'square': '({0} ** 2)',
+    'square_root': '(0 if ({t} := {0}) < 0 else math.sqrt({t}))',
+    'add': '({0} + {1})',
+    'subtract': '({0} - {1})',
+    'multiply': '({0} * {1})',
+    'divide': '(math.inf if ({t} := {1}) == 0 else {0} / {t})',
+    'maximum': 'max({0}, {1})',
+    'minimum': 'min({0}, {1})',
+    'bool_not': '(not {0})',
+    'bool_and': '({0} and {1})',
+    'bool_or': '({0} or {1})',
+    'bool_xor': '({0} != {1})',
+    'greater_than': '({0} > {1})',
+    'less_than': '({0} < {1})',
+    'if_else': '({1} if {0} else {2})',
+}
+"""Python expression templates equivalent to each primitive function in `twocarsgpnode`, keyed by function ID.
+`{0}`, `{1}`, ... are replaced with the expressions of the input nodes,
+and `{t}` and `{u}` with temporary variables unique to the node.
+The game state is available as `s`."""
+
+PURE_FUNCTIONS: set[str] = {
+    'zero', 'one',
+    'negate', 'invert', 'sign', 'absolute_value', 'square', 'square_root',
+    'add', 'subtract', 'multiply', 'divide', 'maximum', 'minimum',
+    'bool_not', 'bool_and', 'bool_or', 'bool_xor', 'greater_than', 'less_than',
+}
+"""Primitive functions whose output depends only on their inputs and not the game state.
+If all the inputs of one of these are constant, it is evaluated once during compilation and replaced by its value."""
+
+CONDITIONAL_INPUTS: dict[str, tuple[int, ...]] = {
+    'if_else': (1, 2),
+    'bool_and': (1,),
+    'bool_or': (1,),
+}
+"""The inputs of each primitive function which `EXPRESSIONS` only evaluates under some condition.
+Subtrees which only appear as these inputs are never computed in advance, since computing them could raise an error."""
+
+COMPILED_CACHE_SIZE: int = 4096
+"""Number of compiled functions kept by `compile_source`. The least recently used are discarded first."""
+
+_NOT_CONSTANT = object()
+
+
+class _Subtree(NamedTuple):
+    key: Hashable
+    """Equal for subtrees which compile to the same expression."""
+    value: Any
+    """The value of the subtree if it is constant, otherwise `_NOT_CONSTANT`."""
+    node: GPNode
+    """The node whose expression is compiled for this subtree, which differs from the original node if an `if_else` was folded."""
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def compile_source(source: str) -> Callable[[TwoCarsState], Any]:
+    """Compiles the source returned by `tree_source` for a tree of `TwoCarsGPNode` into a single Python function of the game state.
+
+    Executing the tree directly costs a function call, a list lookup, and a context lookup for every node on every timestep.
+    The compiled function computes the same value as `tree.execute({'state': state})`.
+    The driver creates new agents for every evaluation, so the same genotypes are compiled over and over;
+    the functions are cached by their source, and agents with equivalent genotypes share the same function.
+
+    Raises:
+        ValueError: If the source is too deep to compile.
+    """
+    try:
+        code = compile(source, '<compiled GP tree>', 'exec')
+    except (SyntaxError, RecursionError, MemoryError) as error:
+        raise ValueError(f"Could not compile GP tree:\n{error}") from error
+
+    namespace = _namespace()
+    exec(code, namespace)
+    return namespace['policy']
+
+
+def tree_source(tree: GPTree) -> str:
+    """Returns the source of a function of the game state equivalent to a tree, to be compiled by `compile_source`.
+
+    Subtrees which don't depend on the game state are replaced by their values (see `PURE_FUNCTIONS`),
+    as are `if_else` nodes with a constant condition and `bool_and` and `bool_or` nodes with a deciding constant left input.
+    Subtrees which appear more than once are computed once and stored in a local variable,
+    unless they only appear in `CONDITIONAL_INPUTS`.
+    Trees with the same structure and literal values have the same source.
+
+    Raises:
+        ValueError: If the tree contains a primitive without an entry in `EXPRESSIONS`, or is too deep to compile.
+    """
+    try:
+        subtrees = {}
+        root = _fold_subtree(tree.root, subtrees)
+
+        counts = collections.Counter()
+        unconditional = set()
+        _count_subtrees(root, subtrees, counts, unconditional)
+        shared = {
+            key for key, count in counts.items()
+            if count > 1 and key in unconditional and not _is_simple(key)
+        }
+        # Occurrences within another shared subtree are only compiled once, so some of these may now appear only once.
+        counts.clear()
+        _count_subtrees(root, subtrees, counts, shared=shared)
+        shared = {key for key in shared if counts[key] > 1}
+
+        assignments = []
+        variables = {key: None for key in shared}
+        expression = _subtree_expression(root, subtrees, variables, assignments, itertools.count())
+    except RecursionError as error:
+        raise ValueError(f"Could not compile GP tree:\n{error}") from error
+
+    lines = [f"    {variable} = {assigned_expression}\n" for variable, assigned_expression in assignments]
+    return f"def policy(s):\n{''.join(lines)}    return {expression}\n"
+
+
+def _namespace() -> dict[str, Any]:
+    return {'math': math, 'inf': math.inf, 'nan': math.nan}
+
+
+def _fold_subtree(node: GPNode, subtrees: dict[int, _Subtree]) -> _Subtree:
+    """Identifies the subtree rooted at a node, evaluating it if it is constant. Results are stored in `subtrees` by node ID."""
+    if node.literal is not None:
+        subtree = _Subtree(_literal_expression(node.literal), node.literal, node)
+        subtrees[id(node)] = subtree
+        return subtree
+
+    function_id = node.function_id
+    if function_id not in EXPRESSIONS:
+        raise ValueError(f"No compiled expression for primitive function {function_id}.")
+    inputs = [_fold_subtree(input_node, subtrees) for input_node in node.input_nodes]
+    input_values = [input_subtree.value for input_subtree in inputs]
+
+    if function_id == 'if_else' and input_values[0] is not _NOT_CONSTANT:
+        subtree = inputs[1] if input_values[0] else inputs[2]
+        subtrees[id(node)] = subtree
+        return subtree
+
+    if function_id in ('bool_and', 'bool_or') and input_values[0] is not _NOT_CONSTANT:
+        # The right input is never evaluated if the left input decides the result.
+        if bool(input_values[0]) == (function_id == 'bool_or'):
+            subtrees[id(node)] = inputs[0]
+            return inputs[0]
+
+    if function_id in PURE_FUNCTIONS and _NOT_CONSTANT not in input_values:
+        constant_expression = EXPRESSIONS[function_id].format(*map(_literal_expression, input_values), t='_t', u='_u')
+        try:
+            value = eval(constant_expression, _namespace())
+        except ArithmeticError:
+            # Leave the error to be raised when the tree is executed, as it would be without compilation.
+            pass
+        else:
+            subtree = _Subtree(_literal_expression(value), value, node)
+            subtrees[id(node)] = subtree
+            return subtree
+
+    subtree = _Subtree((function_id, *(input_subtree.key for input_subtree in inputs)), _NOT_CONSTANT, node)
+    subtrees[id(node)] = subtree
+    return subtree
+
+
+def _count_subtrees(
+        subtree: _Subtree,
+        subtrees: dict[int, _Subtree],
+        counts: collections.Counter,
+        unconditional: set[Hashable] | None = None,
+        conditional: bool = False,
+        shared: set[Hashable] = frozenset()
+) -> None:
+    """Counts the occurrences of each non-constant subtree which will be compiled,
+    not counting the inputs of a subtree in `shared` after its first occurrence.
+    Subtrees which occur at least once outside `CONDITIONAL_INPUTS` are added to `unconditional`."""
+    if subtree.value is not _NOT_CONSTANT:
+        return
+    counts[subtree.key] += 1
+    if unconditional is not None and not conditional:
+        unconditional.add(subtree.key)
+    if subtree.key in shared and counts[subtree.key] > 1:
+        return
+
+    node = subtree.node
+    conditional_indices = CONDITIONAL_INPUTS.get(node.function_id, ())
+    for index, input_node in enumerate(node.input_nodes):
+        input_conditional = conditional or index in conditional_indices
+        _count_subtrees(subtrees[id(input_node)], subtrees, counts, unconditional, input_conditional, shared)
+
+
+def _is_simple(key: Hashable) -> bool:
+    """Returns true for terminals which are no more expensive to compute again than to store, such as a state variable."""
+    return len(key) == 1 and re.fullmatch(r'[\w.]+', EXPRESSIONS[key[0]]) is not None
+
+
+def _subtree_expression(
+        subtree: _Subtree,
+        subtrees: dict[int, _Subtree],
+        variables: dict[Hashable, str | None],
+        assignments: list[tuple[str, str]],
+        temporaries: Iterator[int]
+) -> str:
+    """Returns the expression for a subtree.
+    The first occurrence of a subtree in `variables` is instead added to `assignments`, in the order they must be computed."""
+    if subtree.value is not _NOT_CONSTANT:
+        return subtree.key
+    if variables.get(subtree.key) is not None:
+        return variables[subtree.key]
+
+    node = subtree.node
+    input_expressions = [
+        _subtree_expression(subtrees[id(input_node)], subtrees, variables, assignments, temporaries)
+        for input_node in node.input_nodes
+    ]
+    temporary = next(temporaries)
+    expression = EXPRESSIONS[node.function_id].format(*input_expressions, t=f'_t{temporary}', u=f'_u{temporary}')
+
+    if subtree.key in variables:
+        variable = f'_s{len(assignments)}'
+        assignments.append((variable, expression))
+        variables[subtree.key] = variable
+        return variable
+    return expression
+
+
+def _literal_expression(value: Any) -> str:
+    literal = repr(value)
+    return f'({literal})' if literal.startswith('-') else literal
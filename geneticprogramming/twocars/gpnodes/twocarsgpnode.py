@@ -51,15 +51,13 @@ def evader_speed(input_nodes, context):
 @TwoCarsGPNode.gp_primitive(FLOAT, ())
 def pursuer_turning_radius(input_nodes, context):
     state: TwoCarsState = context['state']
-    turning_radius = state.pursuer.speed / state.pursuer.turning_rate
-    return turning_radius
+    return state.pursuer.turning_radius
 
 
 @TwoCarsGPNode.gp_primitive(FLOAT, ())
 def evader_turning_radius(input_nodes, context):
     state: TwoCarsState = context['state']
-    turning_radius = state.evader.speed / state.evader.turning_rate
-    return turning_radius
+    return state.evader.turning_radius
 
 
 @TwoCarsGPNode.gp_primitive(FLOAT, ())
@@ -73,8 +71,8 @@ def distance_pursuer_evader(input_nodes, context):
 def distance_pursuer_evader_x(input_nodes, context):
     """X component of the distance between pursuer and evader in the pursuer's frame of reference."""
     state: TwoCarsState = context['state']
-    right_heading = state.pursuer.heading + math.pi / 2
-    projection = (state.evader.x - state.pursuer.x) * math.cos(right_heading) + (state.evader.y - state.pursuer.y) * math.sin(right_heading)
+    # Rotated by 90 degrees: cos(heading + pi/2) = -sin(heading), sin(heading + pi/2) = cos(heading)
+    projection = (state.evader.y - state.pursuer.y) * state.pursuer.cos_heading - (state.evader.x - state.pursuer.x) * state.pursuer.sin_heading
     return projection
 
 
@@ -82,7 +80,7 @@ def distance_pursuer_evader_x(input_nodes, context):
 def distance_pursuer_evader_y(input_nodes, context):
     """Y component of the distance between pursuer and evader in the pursuer's frame of reference."""
     state: TwoCarsState = context['state']
-    projection = (state.evader.x - state.pursuer.x) * math.sin(state.pursuer.heading) - (state.evader.y - state.pursuer.y) * math.cos(state.pursuer.heading)
+    projection = (state.evader.x - state.pursuer.x) * state.pursuer.sin_heading - (state.evader.y - state.pursuer.y) * state.pursuer.cos_heading
     return projection
 
 
@@ -90,8 +88,8 @@ def distance_pursuer_evader_y(input_nodes, context):
 def distance_evader_pursuer_x(input_nodes, context):
     """X component of the distance between evader and pursuer in the evader's frame of reference."""
     state: TwoCarsState = context['state']
-    right_heading = state.evader.heading + math.pi / 2
-    projection = (state.pursuer.x - state.evader.x) * math.cos(right_heading) + (state.pursuer.y - state.evader.y) * math.sin(right_heading)
+    # Rotated by 90 degrees: cos(heading + pi/2) = -sin(heading), sin(heading + pi/2) = cos(heading)
+    projection = (state.pursuer.y - state.evader.y) * state.evader.cos_heading - (state.pursuer.x - state.evader.x) * state.evader.sin_heading
     return projection
 
 
@@ -99,7 +97,7 @@ def distance_evader_pursuer_x(input_nodes, context):
 def distance_evader_pursuer_y(input_nodes, context):
     """Y component of the distance between evader and pursuer in the evader's frame of reference."""
     state: TwoCarsState = context['state']
-    projection = (state.pursuer.x - state.evader.x) * math.sin(state.evader.heading) - (state.pursuer.y - state.evader.y) * math.cos(state.evader.heading)
+    projection = (state.pursuer.x - state.evader.x) * state.evader.sin_heading - (state.pursuer.y - state.evader.y) * state.evader.cos_heading
     return projection
 
 
@@ -126,10 +124,10 @@ def negate(input_nodes, context):
 @TwoCarsGPNode.gp_primitive(FLOAT, (FLOAT,))
 def invert(input_nodes, context):
     value = input_nodes[0].execute(context)
-    if value == 0:
-        return math.inf
-    else:
+    try:
         return 1 / value
+    except ZeroDivisionError:
+        return math.inf
 
 
 @TwoCarsGPNode.gp_primitive(FLOAT, (FLOAT,))
@@ -190,10 +188,10 @@ def divide(input_nodes, context):
     """Division operator; returns infinity if the divisor is zero."""
     left = input_nodes[0].execute(context)
     right = input_nodes[1].execute(context)
-    if right == 0:
-        return math.inf
-    else:
+    try:
         return left / right
+    except ZeroDivisionError:
+        return math.inf
 
 
 @TwoCarsGPNode.gp_primitive(FLOAT, (FLOAT, FLOAT))
@@ -219,15 +217,13 @@ def bool_not(input_nodes, context):
 @TwoCarsGPNode.gp_primitive(BOOL, (BOOL, BOOL))
 def bool_and(input_nodes, context):
     left = input_nodes[0].execute(context)
-    right = input_nodes[1].execute(context)
-    return left and right
+    return left and input_nodes[1].execute(context)
 
 
 @TwoCarsGPNode.gp_primitive(BOOL, (BOOL, BOOL))
 def bool_or(input_nodes, context):
     left = input_nodes[0].execute(context)
-    right = input_nodes[1].execute(context)
-    return left or right
+    return left or input_nodes[1].execute(context)
 
 
 @TwoCarsGPNode.gp_primitive(BOOL, (BOOL, BOOL))
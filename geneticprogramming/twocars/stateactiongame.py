@@ -1,4 +1,4 @@
-from typing import TypeVar, Generic, Callable, Any, Sequence
+from typing import TypeVar, Generic, Callable, Any, Sequence, Optional
 
 from modularcoevolution.agents.baseagent import BaseAgent
 
@@ -18,6 +18,15 @@ class StateActionGame(Generic[State]):
     """A function that returns whether a given state is terminal."""
     payoff: Callable[[State, int], float]
     """A function that returns the payoff of a given state for a given player."""
+    copy_state: Optional[Callable[[State], State]]
+    """A function that returns a copy of a given state.
+    If provided, `step` may modify the state it is given in place,
+    so the initial state is copied at the start of each evaluation, and each state is copied into the exhibition history."""
+    play: Optional[Callable[..., State]]
+    """A function that plays a whole game from the given initial state between the given agents, and returns the final state.
+    It must not modify the initial state.
+    If provided, `evaluate` uses this instead of `step` when exhibition data isn't needed,
+    so that it can be specialized to the game."""
 
     def __init__(
             self,
@@ -25,25 +34,33 @@ class StateActionGame(Generic[State]):
             step: Callable[[State, Any], State],
             current_player: Callable[[State], int],
             is_terminal: Callable[[State], bool],
-            payoff: Callable[[State, int], float]
+            payoff: Callable[[State, int], float],
+            copy_state: Optional[Callable[[State], State]] = None,
+            play: Optional[Callable[..., State]] = None
     ):
         self.initial_state = initial_state
         self.step = step
         self.current_player = current_player
         self.is_terminal = is_terminal
         self.payoff = payoff
+        self.copy_state = copy_state
+        self.play = play
 
     def evaluate(self, agents: Sequence[BaseAgent], exhibition: bool = False, **kwargs) -> Sequence[dict[str, Any]]:
-        state = self.initial_state
+        if self.play is not None and not exhibition:
+            state = self.play(self.initial_state, *agents)
+            return [{'payoff': float(self.payoff(state, player))} for player in range(len(agents))]
+
+        state = self._copy(self.initial_state)
         state_history = []
         if exhibition:
-            state_history.append(state)
+            state_history.append(self._copy(state))
         while not self.is_terminal(state):
             player = self.current_player(state)
             action = agents[player].perform_action(state)
             state = self.step(state, action)
             if exhibition:
-                state_history.append(state)
+                state_history.append(self._copy(state))
 
         results: list[dict[str, Any]]
         results = [{'payoff': float(self.payoff(state, player))} for player in range(len(agents))]
@@ -52,4 +69,5 @@ class StateActionGame(Generic[State]):
             results.append(exhibition_data)
         return results
 
-
+    def _copy(self, state: State) -> State:
+        return state if self.copy_state is None else self.copy_state(state)
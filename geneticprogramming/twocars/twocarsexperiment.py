@@ -8,6 +8,7 @@ from modularcoevolution.generators.evolutiongenerator import EvolutionGenerator
 
 import geneticprogramming.twocars.twocarsgame as twocarsgame
 from geneticprogramming.twocars.agents.twocarsgpagent import TwoCarsGPAgent
+from geneticprogramming.twocars.evaluationcache import EvaluationCache
 from geneticprogramming.twocars.stateactiongame import StateActionGame
 
 
@@ -16,6 +17,10 @@ class TwoCarsExperiment(BaseExperiment):
     game: StateActionGame[twocarsgame.TwoCarsState]
     """The starting state of the game given the configured parameters.
     This uses a successor function to generate further states, and is not modified."""
+    evaluation_cache: EvaluationCache
+    """Reuses the results of `game.evaluate` for repeated matchups, since the game is deterministic.
+    Only effective when evaluations run in this process (`-np`), as the copies sent to worker processes are disabled,
+    so it is off unless `evaluation_cache_size` is set in the config."""
 
     def __init__(self, config: dict[str, Any]):
         super().__init__(config)
@@ -37,6 +42,7 @@ class TwoCarsExperiment(BaseExperiment):
 
         capture_radius = experiment_config['capture_radius']
         game_duration = experiment_config['game_duration']
+        evaluation_cache_size = experiment_config.get('evaluation_cache_size', 0)
 
         initial_pursuer_state = twocarsgame.CarState(pursuer_speed, pursuer_turning_rate, pursuer_x, pursuer_y, pursuer_heading)
         initial_evader_state = twocarsgame.CarState(evader_speed, evader_turning_rate, evader_x, evader_y, evader_heading)
@@ -47,8 +53,11 @@ class TwoCarsExperiment(BaseExperiment):
             twocarsgame.step,
             twocarsgame.current_player,
             twocarsgame.is_terminal,
-            twocarsgame.payoff
+            twocarsgame.payoff,
+            twocarsgame.copy_state,
+            twocarsgame.play_match
         )
+        self.evaluation_cache = EvaluationCache(self.game.evaluate, TwoCarsGPAgent.structure_key, evaluation_cache_size)
 
     def player_populations(self) -> Sequence[int]:
         return [0, 1]
@@ -68,7 +77,7 @@ class TwoCarsExperiment(BaseExperiment):
         return [metrics, metrics]
 
     def get_evaluate(self, **kwargs) -> EvaluateProtocol:
-        return partial(self.game.evaluate, **kwargs)
+        return partial(self.evaluation_cache, **kwargs)
 
     def _process_exhibition_results(self, agent_group, agent_numbers, agent_names, result, log_path):
         super()._process_exhibition_results(agent_group, agent_numbers, agent_names, result, log_path)
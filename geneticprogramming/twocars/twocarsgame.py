@@ -1,12 +1,12 @@
-import io
+import dataclasses
 import math
-from typing import NamedTuple
+import sys
+from typing import Any
 
 import cairo
 import numpy
 from PIL import Image
 
-
 EPSILON = 1e-6
 
 PURSUER = 0
@@ -16,19 +16,33 @@ ACTIONS = [-1, 0, 1]
 ACTION_NAMES = ["Right", "Straight", "Left"]
 
 
-class CarState(NamedTuple):
+@dataclasses.dataclass(slots=True)
+class CarState:
     speed: float
     """Constant speed of the car."""
     turning_rate: float
     """Rate at which the car can turn in radians per timestep."""
+    turning_radius: float = dataclasses.field(init=False)
+    """Radius of the car's tightest turn, computed from the speed and turning rate."""
 
     x: float
     y: float
     heading: float
     """Heading of the car in radians. 0 is to the right, increasing counterclockwise."""
+    sin_heading: float = dataclasses.field(init=False)
+    """Sine of the heading, kept up to date by `step`."""
+    cos_heading: float = dataclasses.field(init=False)
+    """Cosine of the heading, kept up to date by `step`."""
+
+    def __post_init__(self):
+        self.turning_radius = self.speed / self.turning_rate if self.turning_rate != 0 else math.inf
+        self.sin_heading = math.sin(self.heading)
+        self.cos_heading = math.cos(self.heading)
 
 
-class TwoCarsState(NamedTuple):
+@dataclasses.dataclass(slots=True)
+class TwoCarsState:
+    """The state of a game. States are modified in place by `step`; use `copy_state` to keep a previous state."""
     total_turns: int
     """Maximum number of timesteps in the game before the evader wins."""
     capture_radius: float
@@ -61,6 +75,21 @@ def new_state(total_turns, capture_radius, pursuer, evader) -> TwoCarsState:
     )
 
 
+def copy_state(state: TwoCarsState) -> TwoCarsState:
+    copied_state = _copy_slots(state)
+    copied_state.pursuer = _copy_slots(state.pursuer)
+    copied_state.evader = _copy_slots(state.evader)
+    return copied_state
+
+
+def _copy_slots(instance: Any) -> Any:
+    # Faster than `dataclasses.replace`, which would rerun `__init__` and recompute the trigonometry in `CarState.__post_init__`.
+    copied_instance = object.__new__(type(instance))
+    for field in type(instance).__slots__:
+        setattr(copied_instance, field, getattr(instance, field))
+    return copied_instance
+
+
 def current_player(state: TwoCarsState) -> int:
     return state.current_player
 
@@ -78,14 +107,12 @@ def turn_rate_from_turn_radius(speed: float, turn_radius: float) -> float:
 
 
 def _angle_difference(a: float, b: float) -> float:
-    return (a - b + math.pi) % (2 * math.pi) - math.pi
-
-
-def _euclidean_distance(state: TwoCarsState) -> float:
-    return math.sqrt((state.pursuer.x - state.evader.x) ** 2 + (state.pursuer.y - state.evader.y) ** 2)
+    # Wrapped to [-pi, pi] in one call. Odd multiples of pi may wrap to either pi or -pi.
+    return math.remainder(a - b, math.tau)
 
 
 def step(state: TwoCarsState, action: float) -> TwoCarsState:
+    """Advances the state in place, and returns it."""
     action = float(action)
     if state.current_player == PURSUER:
         return _simultaneous_step(state, action)
@@ -94,77 +121,147 @@ def step(state: TwoCarsState, action: float) -> TwoCarsState:
 
 
 def _simultaneous_step(state: TwoCarsState, pursuer_action: float) -> TwoCarsState:
-    state_next = state._replace(
-        pursuer_action=pursuer_action,
-        current_player=EVADER
-    )
-    return state_next
+    state.pursuer_action = pursuer_action
+    state.current_player = EVADER
+    return state
 
 
 def _main_step(state: TwoCarsState, evader_action: float) -> TwoCarsState:
     pursuer = state.pursuer
     evader = state.evader
 
-    pursuer_next_heading = pursuer.heading + pursuer.turning_rate * state.pursuer_action
-    pursuer_next = CarState(
-        speed=pursuer.speed,
-        turning_rate=pursuer.turning_rate,
-        x=pursuer.x + pursuer.speed * math.cos(pursuer_next_heading),
-        y=pursuer.y + pursuer.speed * math.sin(pursuer_next_heading),
-        heading=pursuer_next_heading
-    )
+    # Capture is checked at the positions from before this step's movement.
+    distance = math.sqrt((pursuer.x - evader.x) ** 2 + (pursuer.y - evader.y) ** 2)
 
-    evader_next_heading = evader.heading + evader.turning_rate * evader_action
-    evader_next = CarState(
-        speed=evader.speed,
-        turning_rate=evader.turning_rate,
-        x=evader.x + evader.speed * math.cos(evader_next_heading),
-        y=evader.y + evader.speed * math.sin(evader_next_heading),
-        heading=evader_next_heading
-    )
+    pursuer.heading += pursuer.turning_rate * state.pursuer_action
+    pursuer.sin_heading = math.sin(pursuer.heading)
+    pursuer.cos_heading = math.cos(pursuer.heading)
+    pursuer.x += pursuer.speed * pursuer.cos_heading
+    pursuer.y += pursuer.speed * pursuer.sin_heading
+
+    evader.heading += evader.turning_rate * evader_action
+    evader.sin_heading = math.sin(evader.heading)
+    evader.cos_heading = math.cos(evader.heading)
+    evader.x += evader.speed * evader.cos_heading
+    evader.y += evader.speed * evader.sin_heading
 
-    turns_remaining = state.turns_remaining - 1
-    current_player = PURSUER
+    state.turns_remaining -= 1
+    state.current_player = PURSUER
+    state.pursuer_action = 0.0
 
-    distance = _euclidean_distance(state)
     capture = distance < state.capture_radius
-    is_terminal = True if turns_remaining <= 0 else False
-    is_terminal = True if capture else is_terminal
+    state.is_terminal = capture or state.turns_remaining <= 0
 
     # Payoff from evader's perspective
-    payoff = 1.0 if turns_remaining == 0 else 0.0
-    payoff = -float(turns_remaining) / state.total_turns if capture else payoff
+    payoff = 1.0 if state.turns_remaining == 0 else 0.0
+    state.payoff = -float(state.turns_remaining) / state.total_turns if capture else payoff
+    return state
 
-    return TwoCarsState(
-        total_turns=state.total_turns,
-        capture_radius=state.capture_radius,
-        pursuer=pursuer_next,
-        evader=evader_next,
-        turns_remaining=turns_remaining,
-        current_player=current_player,
-        pursuer_action=0.0,
-        is_terminal=is_terminal,
-        payoff=payoff
-    )
+
+def play_match(initial_state: TwoCarsState, pursuer: Any, evader: Any) -> TwoCarsState:
+    """Plays the game between a pursuer and evader agent from a copy of the initial state, and returns the final state.
+    Equivalent to alternating `step` with the current player's action until the state is terminal,
+    without calling `current_player` or `step` to decide which player acts."""
+    state = copy_state(initial_state)
+    pursuer_action = pursuer.perform_action
+    evader_action = evader.perform_action
+    while not state.is_terminal:
+        _simultaneous_step(state, float(pursuer_action(state)))
+        _main_step(state, float(evader_action(state)))
+    return state
 
 
 def render_evaluation(full_states: list[TwoCarsState], path: str = None) -> cairo.SVGSurface:
     initial_state = full_states[0]
-    states = numpy.array(
+    states = _trajectory_array(full_states)
+    image_size = 512
+
+    surface = cairo.SVGSurface(path, image_size, image_size)
+    surface.set_document_unit(cairo.SVG_UNIT_PX)  # Cairo uses points by default otherwise
+    context = cairo.Context(surface)
+    _transform_context(context, _render_extents(states, initial_state.capture_radius), image_size)
+
+    _draw_cars(context, states[-1], initial_state.capture_radius)
+
+    # Draw the pursuer and evader paths
+    context.set_source_rgb(1, 0, 0)
+    _draw_path(context, states[:, :3])
+    context.set_source_rgb(0, 1, 0)
+    _draw_path(context, states[:, 3:])
+
+    _draw_capture_region(context, states[-1], initial_state.capture_radius)
+
+    surface.flush()
+    return surface
+
+
+def render_evaluation_gif(full_states: list[TwoCarsState], path: str, duration = 30) -> None:
+    if not str(path).endswith(".gif"):
+        path = str(path) + ".gif"
+
+    initial_state = full_states[0]
+    states = _trajectory_array(full_states)
+    image_size = 512
+    # Every frame uses the extents of the whole game, so the paths drawn so far are the same in every later frame.
+    # Each frame only adds its newest path segments to `trail`, rather than redrawing the whole path.
+    extents = _render_extents(states, initial_state.capture_radius)
+    trail = cairo.ImageSurface(cairo.FORMAT_ARGB32, image_size, image_size)
+    trail_context = cairo.Context(trail)
+    _transform_context(trail_context, extents, image_size)
+
+    frames = []
+    for i in range(len(states)):
+        if i > 0:
+            trail_context.set_source_rgb(1, 0, 0)
+            _draw_path(trail_context, states[i - 1:i + 1, :3])
+            trail_context.set_source_rgb(0, 1, 0)
+            _draw_path(trail_context, states[i - 1:i + 1, 3:])
+            trail.flush()
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, image_size, image_size)
+        context = cairo.Context(surface)
+        context.set_source_surface(trail)
+        context.paint()
+        _transform_context(context, extents, image_size)
+        _draw_cars(context, states[i], initial_state.capture_radius)
+        _draw_capture_region(context, states[i], initial_state.capture_radius)
+        surface.flush()
+        frames.append(_surface_image(surface))
+
+    # Every frame shares one palette, taken from the last frame since it contains every path drawn,
+    # rather than each RGBA frame being quantized separately when saved.
+    palette_image = frames[-1].quantize(dither=Image.Dither.NONE)
+    frames = [frame.quantize(palette=palette_image, dither=Image.Dither.NONE) for frame in frames]
+    # The background is black, which is made transparent.
+    background = Image.new('RGB', (1, 1)).quantize(palette=palette_image, dither=Image.Dither.NONE).getpixel((0, 0))
+    frames[0].save(
+        path, save_all=True, append_images=frames[1:], optimize=True, duration=duration, loop=0, disposal=2, transparency=background
+    )
+
+
+def _surface_image(surface: cairo.ImageSurface) -> Image.Image:
+    """Copies the pixels of an ARGB32 surface into an RGB PIL image over a black background, without encoding them as a PNG."""
+    # Cairo stores each pixel as a premultiplied native-endian 32-bit integer,
+    # which is BGRA order on little-endian machines and ARGB order on big-endian machines.
+    # Ignoring the alpha of premultiplied colors is the same as compositing them over black.
+    raw_mode = 'BGRX' if sys.byteorder == 'little' else 'XRGB'
+    size = (surface.get_width(), surface.get_height())
+    return Image.frombuffer('RGB', size, bytes(surface.get_data()), 'raw', raw_mode, surface.get_stride(), 1)
+
+
+def _trajectory_array(full_states: list[TwoCarsState]) -> numpy.ndarray:
+    """Returns an array with a row of pursuer x, y, heading and evader x, y, heading for each state."""
+    return numpy.array(
         [[state.pursuer.x, state.pursuer.y, state.pursuer.heading, state.evader.x, state.evader.y, state.evader.heading] for state in full_states]
     )
-    is_reduced = states.shape[1] == 3
-    if is_reduced:
-        min_x = min(states[:, 0].min(), 0) - initial_state.capture_radius
-        max_x = max(states[:, 0].max(), 0) + initial_state.capture_radius
-        min_y = min(states[:, 1].min(), 0) - initial_state.capture_radius
-        max_y = max(states[:, 1].max(), 0) + initial_state.capture_radius
-        states = numpy.append(states, numpy.zeros_like(states), axis=1)
-    else:
-        min_x = min(states[:, 0].min(), states[:, 3].min()) - initial_state.capture_radius
-        max_x = max(states[:, 0].max(), states[:, 3].max()) + initial_state.capture_radius
-        min_y = min(states[:, 1].min(), states[:, 4].min()) - initial_state.capture_radius
-        max_y = max(states[:, 1].max(), states[:, 4].max()) + initial_state.capture_radius
+
+
+def _render_extents(states: numpy.ndarray, capture_radius: float) -> tuple[float, float, float, float, float]:
+    """Returns the minimum x and y, width, and x and y margins of a square region containing every state."""
+    min_x = min(states[:, 0].min(), states[:, 3].min()) - capture_radius
+    max_x = max(states[:, 0].max(), states[:, 3].max()) + capture_radius
+    min_y = min(states[:, 1].min(), states[:, 4].min()) - capture_radius
+    max_y = max(states[:, 1].max(), states[:, 4].max()) + capture_radius
     if max_x - min_x > max_y - min_y:
         max_width = max_x - min_x
         x_margin = 0
@@ -173,16 +270,16 @@ def render_evaluation(full_states: list[TwoCarsState], path: str = None) -> cair
         max_width = max_y - min_y
         x_margin = (max_width - (max_x - min_x)) / 2
         y_margin = 0
+    return min_x, min_y, max_width, x_margin, y_margin
 
-    image_size = 512
+
+def _transform_context(context: cairo.Context, extents: tuple[float, float, float, float, float], image_size: int) -> None:
+    min_x, min_y, max_width, x_margin, y_margin = extents
     line_width = 2
     line_width_context = line_width / image_size * max_width
     x_margin += line_width_context / 2
     y_margin += line_width_context / 2
 
-    surface = cairo.SVGSurface(path, image_size, image_size)
-    surface.set_document_unit(cairo.SVG_UNIT_PX)  # Cairo uses points by default otherwise
-    context = cairo.Context(surface)
     context.scale(image_size, image_size)  # Coordinates are now in [0, 1], center is (0.5, 0.5)
     context.scale(1, -1)  # Flip the y-axis
     context.translate(0, -1)  # Move the origin to the bottom left corner
@@ -192,64 +289,44 @@ def render_evaluation(full_states: list[TwoCarsState], path: str = None) -> cair
 
     context.set_line_width(line_width_context)
 
-    def draw_arrowhead(x: float, y: float, heading: float, radius: float) -> None:
-        front_x = x + radius * math.cos(heading)
-        front_y = y + radius * math.sin(heading)
-        left_x = x + radius * math.cos(heading + 2 * math.pi / 3)
-        left_y = y + radius * math.sin(heading + 2 * math.pi / 3)
-        right_x = x + radius * math.cos(heading - 2 * math.pi / 3)
-        right_y = y + radius * math.sin(heading - 2 * math.pi / 3)
 
-        context.move_to(x, y)
-        context.line_to(right_x, right_y)
-        context.line_to(front_x, front_y)
-        context.line_to(left_x, left_y)
-        context.close_path()
-        context.stroke()
+def _draw_arrowhead(context: cairo.Context, x: float, y: float, heading: float, radius: float) -> None:
+    front_x = x + radius * math.cos(heading)
+    front_y = y + radius * math.sin(heading)
+    left_x = x + radius * math.cos(heading + 2 * math.pi / 3)
+    left_y = y + radius * math.sin(heading + 2 * math.pi / 3)
+    right_x = x + radius * math.cos(heading - 2 * math.pi / 3)
+    right_y = y + radius * math.sin(heading - 2 * math.pi / 3)
 
-    def draw_path(player_states: numpy.ndarray) -> None:
-        for i in range(player_states.shape[0] - 1):
-            x, y, heading = player_states[i]
-            next_x, next_y, next_heading = player_states[i + 1]
+    context.move_to(x, y)
+    context.line_to(right_x, right_y)
+    context.line_to(front_x, front_y)
+    context.line_to(left_x, left_y)
+    context.close_path()
+    context.stroke()
+
+
+def _draw_path(context: cairo.Context, player_states: numpy.ndarray) -> None:
+    for i in range(player_states.shape[0] - 1):
+        x, y, heading = player_states[i]
+        next_x, next_y, next_heading = player_states[i + 1]
 
-            context.move_to(x, y)
-            context.line_to(next_x, next_y)
-        context.stroke()
+        context.move_to(x, y)
+        context.line_to(next_x, next_y)
+    context.stroke()
 
-    # Draw the pursuer and evader
-    pursuer_x, pursuer_y, pursuer_heading, evader_x, evader_y, evader_heading = states[-1]
+
+def _draw_cars(context: cairo.Context, state: numpy.ndarray, capture_radius: float) -> None:
+    pursuer_x, pursuer_y, pursuer_heading, evader_x, evader_y, evader_heading = state
 
     context.set_source_rgb(1, 0, 0)
-    draw_arrowhead(pursuer_x, pursuer_y, pursuer_heading, initial_state.capture_radius / 2)
+    _draw_arrowhead(context, pursuer_x, pursuer_y, pursuer_heading, capture_radius / 2)
 
     context.set_source_rgb(0, 1, 0)
-    draw_arrowhead(evader_x, evader_y, evader_heading, initial_state.capture_radius / 2)
+    _draw_arrowhead(context, evader_x, evader_y, evader_heading, capture_radius / 2)
 
-    # Draw the pursuer and evader paths
-    context.set_source_rgb(1, 0, 0)
-    draw_path(states[:, :3])
-    if not is_reduced:
-        context.set_source_rgb(0, 1, 0)
-        draw_path(states[:, 3:])
 
-    # Draw the capture region
+def _draw_capture_region(context: cairo.Context, state: numpy.ndarray, capture_radius: float) -> None:
     context.set_source_rgba(1, 1, 1)
-    context.arc(states[-1, 3], states[-1, 4], initial_state.capture_radius, 0, 2 * math.pi)
+    context.arc(state[3], state[4], capture_radius, 0, 2 * math.pi)
     context.stroke()
-
-    surface.flush()
-    return surface
-
-
-def render_evaluation_gif(full_states: list[TwoCarsState], path: str, duration = 30) -> None:
-    if not str(path).endswith(".gif"):
-        path = str(path) + ".gif"
-
-    frames = []
-    for i in range(len(full_states)):
-        sub_states = full_states[:i+1]
-        surface = render_evaluation(sub_states)
-        buffer = io.BytesIO()
-        surface.write_to_png(buffer)
-        frames.append(Image.open(buffer))
-    frames[0].save(path, save_all=True, append_images=frames[1:], optimize=True, duration=duration, loop=0, disposal=2)